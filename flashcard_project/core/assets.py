@@ -0,0 +1,173 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import stat
+import sys
+import uuid
+
+import anyio
+from jinja2 import pass_context
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from .compression import accepted_encodings, brotli
+
+
+STATIC_DIR = "static"
+BUILD_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+ASSET_EXTENSIONS = (".css", ".js")
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+# original path (e.g. "css/styles.css") -> fingerprinted path (e.g. "dist/css/styles.1a2b3c4d.css")
+manifest: dict[str, str] = {}
+
+
+def fingerprint(data: bytes) -> str:
+    """Short content hash used in the fingerprinted file names"""
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def find_assets(static_dir=STATIC_DIR):
+    """Yield the relative paths of every css/js source file"""
+    for root, dirs, files in os.walk(static_dir):
+        rel_root = os.path.relpath(root, static_dir)
+        if rel_root.split(os.sep)[0] == BUILD_DIR:
+            dirs[:] = []
+            continue
+        for name in sorted(files):
+            if name.endswith(ASSET_EXTENSIONS):
+                yield os.path.normpath(os.path.join(rel_root, name)).replace(os.sep, "/")
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Unique temp name, every worker runs build_assets() at startup
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build_assets(static_dir=STATIC_DIR):
+    """Fingerprint the css/js files and write gzip/brotli variants next to them.
+
+    Output files are content addressed, so anything that already exists is left
+    alone and a rebuild with no changes does no writing at all.
+    """
+    new_manifest = {}
+    keep = set()
+
+    for rel_path in find_assets(static_dir):
+        with open(os.path.join(static_dir, rel_path), "rb") as f:
+            data = f.read()
+
+        base, ext = os.path.splitext(rel_path)
+        built = f"{BUILD_DIR}/{base}.{fingerprint(data)}{ext}"
+        new_manifest[rel_path] = built
+
+        out = os.path.join(static_dir, built)
+        variants = {out: lambda: data, out + ".gz": lambda: gzip.compress(data, 9, mtime=0)}
+        if brotli is not None:
+            variants[out + ".br"] = lambda: brotli.compress(data, quality=11)
+
+        for path, produce in variants.items():
+            keep.add(os.path.normpath(path))
+            if not os.path.exists(path):
+                _write(path, produce())
+
+    # Drop outputs from older builds that no longer match any source file
+    build_root = os.path.join(static_dir, BUILD_DIR)
+    for root, dirs, files in os.walk(build_root):
+        for name in files:
+            path = os.path.normpath(os.path.join(root, name))
+            if name != MANIFEST_NAME and path not in keep:
+                os.remove(path)
+
+    _write(os.path.join(build_root, MANIFEST_NAME), json.dumps(new_manifest, indent=2).encode())
+    manifest.clear()
+    manifest.update(new_manifest)
+    return manifest
+
+
+def load_manifest(static_dir=STATIC_DIR):
+    """Load the manifest from an earlier build (e.g. the CLI), or None if it's missing or stale"""
+    path = os.path.join(static_dir, BUILD_DIR, MANIFEST_NAME)
+    try:
+        built_at = os.path.getmtime(path)
+        with open(path) as f:
+            data = json.load(f)
+        sources = set(find_assets(static_dir))
+        if sources != set(data):
+            return None
+        for source in sources:
+            if os.path.getmtime(os.path.join(static_dir, source)) > built_at:
+                return None
+            if not os.path.exists(os.path.join(static_dir, data[source])):
+                return None
+    except (OSError, ValueError):
+        return None
+    manifest.clear()
+    manifest.update(data)
+    return manifest
+
+
+def asset_path(path: str) -> str:
+    """Map a source path to its fingerprinted name, if it has been built"""
+    return manifest.get(path.lstrip("/"), path)
+
+
+@pass_context
+def asset_url_for(context, name, /, **path_params):
+    """Drop-in url_for for templates that resolves static files to their built names"""
+    request = context["request"]
+    if name == "static" and "path" in path_params:
+        path_params["path"] = asset_path(path_params["path"])
+    return request.url_for(name, **path_params)
+
+
+class AssetStaticFiles(StaticFiles):
+    """StaticFiles that serves built assets precompressed and cached forever"""
+
+    encodings = (("br", ".br"), ("gzip", ".gz"))
+
+    async def get_response(self, path, scope):
+        if path.split(os.sep)[0] != BUILD_DIR or scope["method"] not in ("GET", "HEAD"):
+            return await super().get_response(path, scope)
+
+        request_headers = Headers(scope=scope)
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+
+        for coding, suffix in self.encodings:
+            if coding not in accepted:
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+            if stat_result and stat.S_ISREG(stat_result.st_mode):
+                return self.asset_response(full_path, stat_result, request_headers, path, coding)
+
+        full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path)
+        if not (stat_result and stat.S_ISREG(stat_result.st_mode)):
+            raise HTTPException(status_code=404)
+        return self.asset_response(full_path, stat_result, request_headers, path, None)
+
+    def asset_response(self, full_path, stat_result, request_headers, path, coding):
+        # Guess from the uncompressed name so .br/.gz files keep the right content type
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        response = FileResponse(full_path, stat_result=stat_result, media_type=media_type)
+        response.headers["cache-control"] = IMMUTABLE_CACHE
+        response.headers["vary"] = "Accept-Encoding"
+        if coding:
+            response.headers["content-encoding"] = coding
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+if __name__ == "__main__":
+    # python -m core.assets [static_dir]  (run from flashcard_project/)
+    built = build_assets(sys.argv[1] if len(sys.argv) > 1 else STATIC_DIR)
+    for source, target in built.items():
+        print(f"{source} -> {target}")
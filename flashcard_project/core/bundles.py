@@ -0,0 +1,110 @@
+import glob
+import gzip
+import os
+import re
+import uuid
+
+import orjson
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session, select
+from ..db.models import Card, DeckVersion, Set
+
+BUNDLE_DIR = "bundles"
+BUNDLE_FORMAT = 1
+CARD_COLUMNS = ("id", "front", "back")
+
+
+def new_token() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def bundle_path(set_id: int, token: str, version: int) -> str:
+    return os.path.join(BUNDLE_DIR, f"set-{set_id}-{token}-v{version}.json.gz")
+
+
+def bundle_etag(set_id: int, token: str, version: int) -> str:
+    # The token is unique per set, so a new set that reuses a deleted set's id never matches
+    return f'"deck-{set_id}-{token}-v{version}-f{BUNDLE_FORMAT}"'
+
+
+def bump_deck_versions(session: Session, set_ids):
+    """Mark the bundles of these sets stale. Call before committing a card change"""
+    for set_id in {s for s in set_ids if s is not None}:
+        stmt = insert(DeckVersion).values(set_id=set_id, version=1, token=new_token())
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DeckVersion.set_id],
+            set_={"version": DeckVersion.version + 1},
+        )
+        session.execute(stmt)
+
+
+def forget_deck(session: Session, set_id: int):
+    """Drop the version row and bundle files of a deleted set"""
+    version = session.get(DeckVersion, set_id)
+    if version:
+        session.delete(version)
+    remove_bundles(set_id)
+
+
+def remove_bundles(set_id: int, token: str | None = None, older_than: int | None = None):
+    """Delete a set's bundle files, or with token/older_than only its versions below that one"""
+    for path in glob.glob(os.path.join(BUNDLE_DIR, f"set-{set_id}-*.json.gz")):
+        if older_than is not None:
+            # A request that read a newer version may be about to serve its file, leave those alone
+            match = re.fullmatch(rf"set-{set_id}-{token}-v(\d+)\.json\.gz", os.path.basename(path))
+            if match is None or int(match.group(1)) >= older_than:
+                continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def deck_version(session: Session, set_id: int):
+    """Return (set name, token, version) for a set, or None if it doesn't exist"""
+    query = (
+        select(Set.name, DeckVersion.token, DeckVersion.version)
+        .outerjoin(DeckVersion, DeckVersion.set_id == Set.id)
+        .where(Set.id == set_id)
+    )
+    row = session.exec(query).first()
+    if row is None:
+        return None
+    if row[1] is None:
+        # No card has changed since the set was made, give it a token now
+        session.execute(
+            insert(DeckVersion).values(set_id=set_id, version=0, token=new_token()).on_conflict_do_nothing()
+        )
+        session.commit()
+        row = session.exec(query).first()
+    return tuple(row)
+
+
+def write_bundle(session: Session, set_id: int, name: str, version: int, path: str):
+    """Snapshot the set's cards to a gzip'd JSON file, cards stored as compact row arrays"""
+    rows = session.exec(
+        select(Card.id, Card.front, Card.back).where(Card.set_ID == set_id).order_by(Card.id)
+    ).all()
+    data = orjson.dumps({
+        "format": BUNDLE_FORMAT,
+        "set": {"id": set_id, "name": name},
+        "version": version,
+        "columns": CARD_COLUMNS,
+        "cards": [list(row) for row in rows],
+    })
+
+    os.makedirs(BUNDLE_DIR, exist_ok=True)
+    # Unique temp name so two requests building the same bundle don't clash
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(gzip.compress(data, 9, mtime=0))
+    os.replace(tmp, path)
+
+
+def ensure_bundle(session: Session, set_id: int, name: str, token: str, version: int) -> str:
+    """Return the bundle file for this set version, building it the first time it's asked for"""
+    path = bundle_path(set_id, token, version)
+    if not os.path.exists(path):
+        write_bundle(session, set_id, name, version, path)
+        remove_bundles(set_id, token, older_than=version)
+    return path
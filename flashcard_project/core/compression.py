@@ -0,0 +1,180 @@
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, we fall back to gzip only
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    """Parse an Accept-Encoding header into the set of codings with q > 0"""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted.add(coding)
+    return accepted
+
+
+def is_compressible(content_type: str) -> bool:
+    """Only text-like bodies are worth compressing, images/zips already are"""
+    content_type = content_type.split(";")[0].strip().lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES) or content_type.endswith(("+json", "+xml"))
+
+
+class GzipStream:
+    """Incremental gzip compressor, each chunk is flushed so clients can render it"""
+
+    coding = "gzip"
+
+    def __init__(self, level=6):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self.compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliStream:
+    """Incremental brotli compressor, same interface as GzipStream"""
+
+    coding = "br"
+
+    def __init__(self, quality=4):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def finish(self) -> bytes:
+        return self.compressor.finish()
+
+
+def choose_stream(accept_encoding: str):
+    """Pick the best compressor the client accepts, or None"""
+    accepted = accepted_encodings(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return BrotliStream
+    if "gzip" in accepted:
+        return GzipStream
+    return None
+
+
+class CompressionMiddleware:
+    """Compress HTML/JSON responses with brotli or gzip as they stream out.
+
+    Bodies are compressed chunk by chunk and never buffered as a whole. Responses
+    that are small, already encoded, partial, or not text-like pass through untouched.
+    """
+
+    def __init__(self, app, minimum_size=500):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stream_class = choose_stream(Headers(scope=scope).get("accept-encoding", ""))
+        if stream_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        await CompressionResponder(self.app, stream_class, self.minimum_size)(scope, receive, send)
+
+
+class CompressionResponder:
+    def __init__(self, app, stream_class, minimum_size):
+        self.app = app
+        self.stream_class = stream_class
+        self.minimum_size = minimum_size
+        self.send = None
+        self.start_message = None
+        self.stream = None
+        self.passthrough = False
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message):
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            # Hold the headers back until we've seen the first body chunk
+            self.start_message = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = (
+                message["status"] in (204, 206, 304)
+                or "content-encoding" in headers
+                or not is_compressible(headers.get("content-type", ""))
+            )
+            return
+
+        if message_type == "http.response.pathsend":
+            # The server sends the file itself, so there's nothing to compress
+            if self.start_message is not None:
+                start, self.start_message = self.start_message, None
+                await self.send(start)
+            await self.send(message)
+            return
+
+        if message_type != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            if not self.passthrough and not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+            if not self.passthrough:
+                self.stream = self.stream_class()
+                headers = MutableHeaders(raw=start["headers"])
+                headers["Content-Encoding"] = self.stream.coding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    body = self.stream.compress(body) + self.stream.finish()
+                    headers["Content-Length"] = str(len(body))
+                    await self.send(start)
+                    await self.send({"type": "http.response.body", "body": body})
+                    return
+            await self.send(start)
+
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        chunk = self.stream.compress(body)
+        if not more_body:
+            chunk += self.stream.finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -0,0 +1,207 @@
+import asyncio
+import hashlib
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import anyio
+from sqlalchemy import delete
+from sqlmodel import Session, select
+from ..db.models import Card, MediaFile
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional, images just won't get thumbnails
+    Image = None
+
+MEDIA_DIR = "media"
+THUMB_DIR = os.path.join(MEDIA_DIR, "thumbs")
+CHUNK_SIZE = 64 * 1024
+MAX_MEDIA_SIZE = 20 * 1024 * 1024
+MAX_UPLOAD_OVERHEAD = 64 * 1024  # room for the multipart boundaries and part headers
+# Only types we can recognise from their first bytes; never SVG, which can carry scripts
+IMAGE_TYPES = ("image/png", "image/jpeg", "image/gif", "image/webp")
+AUDIO_TYPES = ("audio/mpeg", "audio/ogg", "audio/wav", "audio/webm", "audio/mp4", "audio/flac")
+# ISO-BMFF brands that are audio only, MP4/MOV video and HEIC/AVIF images share the container
+M4A_BRANDS = (b"M4A ", b"M4B ")
+ALLOWED_TYPES = IMAGE_TYPES + AUDIO_TYPES
+THUMB_SIZE = (320, 320)
+
+_pool = None
+
+
+class MediaTooLarge(Exception):
+    pass
+
+
+class UnsupportedMedia(Exception):
+    pass
+
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(MEDIA_DIR, sha256[:2], sha256)
+
+
+def thumb_path(sha256: str) -> str:
+    return os.path.join(THUMB_DIR, f"{sha256}.webp")
+
+
+def media_url(sha256: str) -> str:
+    return f"/media/{sha256}"
+
+
+def thumb_url(sha256: str) -> str:
+    return f"/media/{sha256}/thumb"
+
+
+def is_allowed(content_type: str) -> bool:
+    return content_type in ALLOWED_TYPES
+
+
+def has_thumbnail(content_type: str) -> bool:
+    return Image is not None and content_type in IMAGE_TYPES
+
+
+def sniff_type(head: bytes) -> str | None:
+    """Work out the media type from the file's magic bytes, the client's claim isn't trusted"""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head.startswith(b"RIFF") and head[8:12] == b"WAVE":
+        return "audio/wav"
+    if head.startswith(b"ID3") or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return "audio/mpeg"
+    if head.startswith(b"OggS"):
+        return "audio/ogg"
+    if head.startswith(b"fLaC"):
+        return "audio/flac"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "audio/webm"
+    if head[4:8] == b"ftyp" and head[8:12] in M4A_BRANDS:
+        return "audio/mp4"
+    return None
+
+
+def media_info(media: MediaFile) -> dict:
+    """What templates and socket messages need to show an attachment"""
+    return {
+        "id": media.id,
+        "url": media_url(media.sha256),
+        "thumbnail": thumb_url(media.sha256) if has_thumbnail(media.content_type) else None,
+        "type": media.content_type,
+        "filename": media.filename,
+    }
+
+
+async def store_upload(upload) -> tuple[str, int, str]:
+    """Stream an upload to disk in chunks, hashing as we go. Returns (sha256, size, content type).
+
+    The file ends up at a path named after its hash, so uploading the same
+    image twice only keeps one copy. By the time this runs the server has already
+    spooled the whole upload, so MAX_MEDIA_SIZE here isn't a streaming guard; the
+    media router rejects oversized requests from Content-Length before that.
+    """
+    os.makedirs(MEDIA_DIR, exist_ok=True)
+    tmp = os.path.join(MEDIA_DIR, f"upload-{uuid.uuid4().hex}.tmp")
+    digest = hashlib.sha256()
+    size = 0
+    content_type = None
+    try:
+        async with await anyio.open_file(tmp, "wb") as f:
+            while chunk := await upload.read(CHUNK_SIZE):
+                if content_type is None:
+                    content_type = sniff_type(chunk[:16])
+                    if content_type is None:
+                        raise UnsupportedMedia()
+                size += len(chunk)
+                if size > MAX_MEDIA_SIZE:
+                    raise MediaTooLarge()
+                digest.update(chunk)
+                await f.write(chunk)
+
+        if content_type is None:  # empty upload
+            raise UnsupportedMedia()
+        sha256 = digest.hexdigest()
+        path = blob_path(sha256)
+        if os.path.exists(path):
+            os.remove(tmp)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp, path)
+        return sha256, size, content_type
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def make_thumbnail(src: str, dst: str):
+    """Runs in a worker process, Pillow decoding is CPU heavy and holds the GIL"""
+    with Image.open(src) as img:
+        img.thumbnail(THUMB_SIZE)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA")
+        tmp = f"{dst}.{uuid.uuid4().hex}.tmp"
+        img.save(tmp, "WEBP", quality=80)
+    os.replace(tmp, dst)
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=2)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def ensure_thumbnail(sha256: str) -> str | None:
+    """Return the thumbnail path for a blob, generating it in the process pool if needed"""
+    dst = thumb_path(sha256)
+    if os.path.exists(dst):
+        return dst
+    os.makedirs(THUMB_DIR, exist_ok=True)
+    try:
+        await asyncio.wrap_future(get_pool().submit(make_thumbnail, blob_path(sha256), dst))
+    except Exception as e:
+        print(f"Error making thumbnail for {sha256}: {e}")
+        return None
+    return dst
+
+
+def delete_card_media(session: Session, card_ids) -> set[str]:
+    """Delete the attachment rows of cards being deleted. Returns their hashes for remove_unused_blob"""
+    rows = session.exec(select(MediaFile).where(MediaFile.card_id.in_(list(card_ids)))).all()
+    for media in rows:
+        session.delete(media)
+    return {media.sha256 for media in rows}
+
+
+def delete_set_cards(session: Session, set_ids) -> set[str]:
+    """Delete every card in these sets along with their attachment rows. Returns hashes like delete_card_media"""
+    set_ids = list(set_ids)
+    card_ids = session.exec(select(Card.id).where(Card.set_ID.in_(set_ids))).all()
+    hashes = delete_card_media(session, card_ids) if card_ids else set()
+    session.execute(delete(Card).where(Card.set_ID.in_(set_ids)))
+    return hashes
+
+
+def remove_unused_blob(session: Session, sha256: str):
+    """Delete the file once no card references it any more. Call after committing"""
+    if session.exec(select(MediaFile.id).where(MediaFile.sha256 == sha256)).first():
+        return
+    for path in (blob_path(sha256), thumb_path(sha256)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,237 @@
+import functools
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+
+import anyio
+from sqlalchemy import event
+from starlette.datastructures import Headers
+
+PROFILE_HEADER = "x-profile"
+PROFILE_DIR = "profiles"
+SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+SLOW_QUERY_MS = 50.0
+RECENT_LIMIT = 500  # how many recent timings/queries are kept to pick the slowest from
+MAX_PROFILES = 200  # oldest .collapsed files are pruned past this
+LOCAL_HOSTS = ("127.0.0.1", "::1", "localhost")
+
+
+class StackSampler:
+    """Statistical profiler: a side thread snapshots one thread's stack every few ms.
+
+    Routes here are async, so the sampled thread is the event loop; anything
+    else running on the loop at the same time shows up in the profile too.
+    """
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+
+def write_collapsed(stacks: Counter, name: str) -> str | None:
+    """Write stacks in collapsed format, ready for flamegraph.pl or speedscope"""
+    if not stacks:
+        return None
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_")
+    path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_name}-{os.getpid()}.collapsed")
+    with open(path, "w") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    prune_profiles()
+    return path
+
+
+def prune_profiles(keep=MAX_PROFILES):
+    """Delete the oldest profiles so a busy server can't fill the disk with them"""
+    mtimes = {}
+    for name in os.listdir(PROFILE_DIR):
+        if not name.endswith(".collapsed"):
+            continue
+        path = os.path.join(PROFILE_DIR, name)
+        try:
+            mtimes[path] = os.path.getmtime(path)
+        except FileNotFoundError:  # another worker pruned it already
+            pass
+    if len(mtimes) <= keep:
+        return
+    for path in sorted(mtimes, key=mtimes.get)[:len(mtimes) - keep]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+async def save_profile(sampler, name) -> str | None:
+    """Stop the sampler and write its stacks from a worker thread, off the event loop"""
+    return await anyio.to_thread.run_sync(lambda: write_collapsed(sampler.stop(), name))
+
+
+def is_local(client) -> bool:
+    return client is not None and client[0] in LOCAL_HOSTS
+
+
+class Profiler:
+    """Opt-in request/handler timings, sampled stack profiles and a slow-query log"""
+
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 0.0
+        self.slow_query_ms = SLOW_QUERY_MS
+        self.token = None
+        self.timings = deque(maxlen=RECENT_LIMIT)
+        self.queries = deque(maxlen=RECENT_LIMIT)
+
+    def enable(self, engine, sample_rate=0.0, slow_query_ms=SLOW_QUERY_MS, token=None):
+        self.sample_rate = sample_rate
+        self.slow_query_ms = slow_query_ms
+        self.token = token
+        if not event.contains(engine, "before_cursor_execute", self._before_query):
+            event.listen(engine, "before_cursor_execute", self._before_query)
+            event.listen(engine, "after_cursor_execute", self._after_query)
+        self.enabled = True
+
+    def disable(self, engine):
+        if event.contains(engine, "before_cursor_execute", self._before_query):
+            event.remove(engine, "before_cursor_execute", self._before_query)
+            event.remove(engine, "after_cursor_execute", self._after_query)
+        self.enabled = False
+        self.token = None
+
+    def should_profile(self, headers: Headers | None = None, client=None) -> bool:
+        """Sampled requests, plus any that ask with X-Profile from this machine or with the token"""
+        if headers is not None and self.header_allowed(headers.get(PROFILE_HEADER, ""), client):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def header_allowed(self, value: str, client) -> bool:
+        # compare_digest only takes ASCII str, the header could be anything
+        if self.token and secrets.compare_digest(value.encode(), self.token.encode()):
+            return True
+        return value.lower() in ("1", "true", "yes") and is_local(client)
+
+    def record(self, kind, name, duration, profile=None, cpu=None):
+        self.timings.append({
+            "kind": kind,
+            "name": name,
+            "ms": round(duration * 1000, 2),
+            "cpu_ms": round(cpu * 1000, 2) if cpu is not None else None,
+            "at": time.time(),
+            "profile": profile,
+        })
+
+    @asynccontextmanager
+    async def track(self, kind, name, headers=None, client=None):
+        """Time a block of async code, and capture a stack profile if this one is sampled.
+
+        Besides wall time this records the event loop thread's CPU time, which leaves
+        out sleeps and waiting on clients (but includes other tasks that ran meanwhile).
+        """
+        if not self.enabled:
+            yield
+            return
+        sampler = StackSampler(threading.get_ident()).start() if self.should_profile(headers, client) else None
+        start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            cpu = time.thread_time() - cpu_start
+            profile = await save_profile(sampler, f"{kind}-{name}") if sampler else None
+            self.record(kind, name, duration, profile, cpu)
+
+    def timed(self, kind):
+        """Decorator form of track() for async functions, named after the function"""
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                async with self.track(kind, func.__name__):
+                    return await func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _before_query(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def _after_query(self, conn, cursor, statement, parameters, context, executemany):
+        duration = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+        if duration >= self.slow_query_ms:
+            self.queries.append({
+                "sql": statement,
+                "params": repr(parameters)[:500],
+                "ms": round(duration, 2),
+                "at": time.time(),
+            })
+
+    def slowest(self, kind=None, limit=20, key="ms"):
+        rows = [t for t in self.timings if (kind is None or t["kind"] == kind) and t[key] is not None]
+        return sorted(rows, key=lambda t: t[key], reverse=True)[:limit]
+
+    def slowest_queries(self, limit=20):
+        return sorted(self.queries, key=lambda q: q["ms"], reverse=True)[:limit]
+
+
+profiler = Profiler()
+
+
+def route_name(scope) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path", None) or scope["path"]
+    return f"{scope['method']} {path}"
+
+
+class ProfilingMiddleware:
+    """Times every HTTP request while profiling is on; X-Profile: 1 from localhost also captures a stack profile"""
+
+    def __init__(self, app, profiler=profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        sampler = None
+        if self.profiler.should_profile(Headers(scope=scope), scope.get("client")):
+            sampler = StackSampler(threading.get_ident()).start()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            duration = time.perf_counter() - start
+            # Routing has filled in scope["route"] by now, so we can name the template path
+            name = route_name(scope)
+            profile = await save_profile(sampler, name) if sampler else None
+            self.profiler.record("route", name, duration, profile)
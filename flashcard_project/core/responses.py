@@ -0,0 +1,11 @@
+import orjson
+from fastapi.responses import Response
+
+
+class FastJSONResponse(Response):
+    """JSON response encoded with orjson, much faster than the stdlib json module"""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
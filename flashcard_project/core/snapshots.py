@@ -0,0 +1,109 @@
+import asyncio
+import signal
+import threading
+import time
+
+import orjson
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session, select
+from ..db.models import GameStateField
+
+SNAPSHOT_INTERVAL = 2.0  # seconds between snapshot checks
+RESUME_GRACE = 60.0  # how long a snapshot stays resumable, and how long players get to come back
+HEARTBEAT_KEY = "_saved_at"
+
+# Set once the server has been told to stop, disconnects after that are the restart's doing
+shutdown_requested = threading.Event()
+
+
+class SnapshotWriter:
+    """Periodically copies the game state to SQLite, writing only the fields that changed.
+
+    get_state is called on the event loop every interval and must be cheap; the
+    diffing and the database write happen in a worker thread, so nothing here
+    runs on the answer path.
+    """
+
+    def __init__(self, engine, get_state, interval=SNAPSHOT_INTERVAL):
+        self.engine = engine
+        self.get_state = get_state
+        self.interval = interval
+        self.saved: dict[str, bytes] = {}
+        # Cancelling a task doesn't stop its to_thread worker, so the final save on
+        # shutdown could otherwise overlap a periodic one still running
+        self._write_lock = threading.Lock()
+
+    def changed_fields(self, state: dict) -> dict[str, bytes]:
+        encoded = {key: orjson.dumps(value) for key, value in state.items()}
+        return {key: value for key, value in encoded.items() if self.saved.get(key) != value}
+
+    def write(self, state: dict, heartbeat: bool) -> int:
+        """Upsert the changed fields in one transaction, returns how many were written"""
+        with self._write_lock:
+            return self._write(state, heartbeat)
+
+    def _write(self, state: dict, heartbeat: bool) -> int:
+        changed = self.changed_fields(state)
+        if not changed and not heartbeat:
+            return 0
+
+        now = time.time()
+        rows = [{"key": key, "value": value.decode(), "saved_at": now} for key, value in changed.items()]
+        rows.append({"key": HEARTBEAT_KEY, "value": orjson.dumps(now).decode(), "saved_at": now})
+
+        stmt = insert(GameStateField).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[GameStateField.key],
+            set_={"value": stmt.excluded.value, "saved_at": stmt.excluded.saved_at},
+        )
+        with Session(self.engine) as session:
+            session.execute(stmt)
+            session.commit()
+        self.saved.update(changed)
+        return len(changed)
+
+    async def save(self):
+        state = self.get_state()
+        # Keep the heartbeat fresh while a game runs, even if nobody has scored lately
+        heartbeat = bool(state.get("game_active"))
+        await asyncio.to_thread(self.write, state, heartbeat)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.save()
+            except Exception as e:
+                print(f"Error saving game snapshot: {e}")
+
+
+def load_snapshot(engine, max_age=RESUME_GRACE):
+    """Return the saved game state, or None if there isn't one fresh enough to resume"""
+    with Session(engine) as session:
+        rows = session.exec(select(GameStateField.key, GameStateField.value)).all()
+    state = {key: orjson.loads(value) for key, value in rows}
+    saved_at = state.pop(HEARTBEAT_KEY, None)
+    if saved_at is None or time.time() - saved_at > max_age:
+        return None
+    return state
+
+
+def watch_for_shutdown(signals=(signal.SIGINT, signal.SIGTERM)):
+    """Set shutdown_requested when the server gets a stop signal, then run its own handler.
+
+    The server closes open WebSockets before the lifespan shutdown runs, so the flag
+    has to be set by the signal itself. A close code can't be used for this, clients
+    can send any code they like.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return  # handlers can only be installed from the main thread
+    for sig in signals:
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue  # the default action ends the process, nothing to hand over
+
+        def handler(signum, frame, previous=previous):
+            shutdown_requested.set()
+            previous(signum, frame)
+
+        signal.signal(sig, handler)
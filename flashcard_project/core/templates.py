@@ -1,3 +1,5 @@
 from fastapi.templating import Jinja2Templates
+from .assets import asset_url_for
 
-templates = Jinja2Templates(directory="templates")
\ No newline at end of file
+templates = Jinja2Templates(directory="templates")
+templates.env.globals["url_for"] = asset_url_for
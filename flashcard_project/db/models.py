@@ -6,6 +6,7 @@ class Card(SQLModel, table=True):
     back: str
     set_ID: int = Field(foreign_key="set.id")
     set: "Set" = Relationship(back_populates="cards")
+    media: list["MediaFile"] = Relationship(back_populates="card")
 
 class User(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
@@ -18,3 +19,54 @@ class Set(SQLModel, table=True):
     name: str
     cards: list["Card"] = Relationship(back_populates="set")
 
+class DeckVersion(SQLModel, table=True):
+    """Bumped whenever a card in the set changes, so deck bundles know when to rebuild"""
+    set_id: int = Field(foreign_key="set.id", primary_key=True)
+    version: int = 0
+    token: str  # random per set, keeps ETags apart when SQLite reuses a deleted set's id
+
+class MediaFile(SQLModel, table=True):
+    """An image or audio clip on a card. Files are stored once per sha256, rows can share them"""
+    id: int | None = Field(default=None, primary_key=True)
+    card_id: int = Field(foreign_key="card.id", index=True)
+    sha256: str = Field(index=True)
+    content_type: str
+    size: int
+    filename: str
+    card: "Card" = Relationship(back_populates="media")
+
+class GameStateField(SQLModel, table=True):
+    """One row per GameManager field, so a snapshot only rewrites what changed"""
+    key: str = Field(primary_key=True)
+    value: str
+    saved_at: float
+
+
+# ---------------- JSON API payloads ---------------- #
+class CardCreate(BaseModel):
+    front: str
+    back: str
+    set_ID: int
+
+class CardUpdate(BaseModel):
+    id: int
+    front: str | None = None
+    back: str | None = None
+    set_ID: int | None = None
+
+class CardBulk(BaseModel):
+    create: list[CardCreate] = []
+    update: list[CardUpdate] = []
+    delete: list[int] = []
+
+class SetCreate(BaseModel):
+    name: str
+
+class SetUpdate(BaseModel):
+    id: int
+    name: str | None = None
+
+class SetBulk(BaseModel):
+    create: list[SetCreate] = []
+    update: list[SetUpdate] = []
+    delete: list[int] = []
@@ -1,16 +1,20 @@
 import json
+import os
 import random
 import asyncio
 from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, Depends, Form
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 from sqlmodel import select, Session, SQLModel, Field
-from .db.session import create_db_and_tables, get_session, SessionDep
+from .db.session import create_db_and_tables, get_session, SessionDep, engine
 from .db.models import Card, Set, User
-from .routers import cards, sets
+from .routers import api, cards, media, profiling, sets
 from .core.templates import templates
+from .core.assets import AssetStaticFiles, build_assets, load_manifest
+from .core.compression import CompressionMiddleware
+from .core.snapshots import RESUME_GRACE, SnapshotWriter, load_snapshot, shutdown_requested, watch_for_shutdown
+from .core.media import media_info, shutdown_pool
+from .core.profiling import ProfilingMiddleware, profiler
 
 
 # ---------------- Connection Manager ---------------- #
@@ -65,6 +69,7 @@ class GameManager:
     def __init__(self):
         self.ready_players = set()
         self.current_question = None
+        self.question_media = []  # attachment URLs, sent instead of the files themselves
         self.question_options = []
         self.correct_answer = None
         self.scores = {}
@@ -105,6 +110,7 @@ class GameManager:
 
         question = random.choice(cards)
         self.current_question = question
+        self.question_media = [media_info(m) for m in question.media]
         self.correct_answer = question.back
         self.answered_this_round.clear()
 
@@ -149,6 +155,7 @@ class GameManager:
         """Reset game state for a new game"""
         self.ready_players.clear()
         self.current_question = None
+        self.question_media = []
         self.question_options = []
         self.correct_answer = None
         self.scores = {}
@@ -161,8 +168,43 @@ class GameManager:
         self.ready_players.discard(username)
         self.answered_this_round.discard(username)
 
+    def snapshot(self):
+        """Plain JSON-friendly copy of the game state, for the snapshot writer"""
+        return {
+            "ready_players": sorted(self.ready_players),
+            "current_question_id": self.current_question.id if self.current_question else None,
+            "question_options": list(self.question_options),
+            "correct_answer": self.correct_answer,
+            "scores": dict(self.scores),
+            "game_active": self.game_active,
+            "round_number": self.round_number,
+            "max_rounds": self.max_rounds,
+            "answered_this_round": sorted(self.answered_this_round),
+        }
+
+    def restore(self, state, session: Session):
+        """Load a saved snapshot back in. Returns False if the game can't be resumed"""
+        question = None
+        if state.get("current_question_id") is not None:
+            question = session.get(Card, state["current_question_id"])
+            if question is None:  # card was deleted while we were down
+                return False
+
+        self.ready_players = set(state.get("ready_players", []))
+        self.current_question = question
+        self.question_media = [media_info(m) for m in question.media] if question else []
+        self.question_options = state.get("question_options", [])
+        self.correct_answer = state.get("correct_answer")
+        self.scores = state.get("scores", {})
+        self.game_active = state.get("game_active", False)
+        self.round_number = state.get("round_number", 0)
+        self.max_rounds = state.get("max_rounds", self.max_rounds)
+        self.answered_this_round = set(state.get("answered_this_round", []))
+        return True
+
 
 game = GameManager()
+snapshots = SnapshotWriter(engine, game.snapshot)
 
 
 # ---------------- Lifespan / App Init ---------------- #
@@ -171,16 +213,45 @@ async def lifespan(app: FastAPI):
     print("Creating database and tables...")
     create_db_and_tables()
     print("Database ready.")
+    if load_manifest() is not None:
+        print("Static assets up to date.")
+    else:
+        build_assets()
+        print("Static assets built.")
+    shutdown_requested.clear()
+    watch_for_shutdown()
+    background_tasks = []
+    if restore_game():
+        print(f"Resumed game at round {game.round_number + 1}.")
+        background_tasks.append(asyncio.create_task(expire_resumed_game()))
+    background_tasks.append(asyncio.create_task(snapshots.run()))
+    if os.environ.get("FLASHCARD_PROFILE") == "1":
+        sample_rate = float(os.environ.get("FLASHCARD_PROFILE_SAMPLE_RATE", "0"))
+        # X-Profile: 1 only works from localhost, remote clients have to send this token instead
+        token = os.environ.get("FLASHCARD_PROFILE_TOKEN") or None
+        profiler.enable(engine, sample_rate=sample_rate, token=token)
+        print(f"Profiling enabled (sample rate {sample_rate}), see /debug/profile")
     yield
     print("Shutting down app...")
+    shutdown_requested.set()
+    for task in background_tasks:
+        task.cancel()
+    for task in background_tasks:
+        with suppress(asyncio.CancelledError):
+            await task
+    await snapshots.save()
+    shutdown_pool()
 
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(CompressionMiddleware, minimum_size=500)
+app.add_middleware(ProfilingMiddleware)
 app.include_router(cards.router)
 app.include_router(sets.router)
-
-templates = Jinja2Templates(directory="templates")
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.include_router(api.router)
+app.include_router(media.router)
+app.include_router(profiling.router)
+app.mount("/static", AssetStaticFiles(directory="static"), name="static")
 
 
 # ---------------- Routes ---------------- #
@@ -279,6 +350,14 @@ async def enter_play(request: Request, user_name: str = Form(...), session: Sess
 
 
 # ---------------- WebSocket Trivia Logic ---------------- #
+async def receive_messages(websocket: WebSocket):
+    """Yield incoming messages, each one's handling is timed while profiling is on"""
+    while True:
+        data = await websocket.receive_json()
+        async with profiler.track("websocket", data.get("type") or "unknown"):
+            yield data
+
+
 @app.websocket("/ws/{username}")
 async def websocket_endpoint(websocket: WebSocket, username: str, session: Session = Depends(get_session)):
     username = username.strip()
@@ -310,14 +389,14 @@ async def websocket_endpoint(websocket: WebSocket, username: str, session: Sessi
         await manager.send_personal_message(username, {
             "type": "new_question",
             "question": game.current_question.front,
+            "media": game.question_media,
             "options": game.question_options,
             "round": game.round_number,
             "total_rounds": game.max_rounds
         })
 
     try:
-        while True:
-            data = await websocket.receive_json()
+        async for data in receive_messages(websocket):
             msg_type = data.get("type")
 
             if msg_type == "chat_message":
@@ -405,8 +484,11 @@ async def websocket_endpoint(websocket: WebSocket, username: str, session: Sessi
                         "message": "Incorrect - keep trying!"
                     })
 
-    except WebSocketDisconnect:
+    except WebSocketDisconnect as e:
         manager.disconnect(username, websocket)
+        if shutdown_requested.is_set():
+            # Server is restarting, keep the game so the next process can resume it
+            return
         game.cleanup_player(username)
         
         remaining_users = manager.get_connected_users()
@@ -432,6 +514,28 @@ async def websocket_endpoint(websocket: WebSocket, username: str, session: Sessi
 
 
 # ---------------- Helper Functions ---------------- #
+def restore_game():
+    """Rehydrate the game from the last snapshot, if it was saved recently enough"""
+    state = load_snapshot(engine)
+    if not state or not state.get("game_active"):
+        return False
+    with Session(engine) as session:
+        return game.restore(state, session)
+
+
+async def expire_resumed_game():
+    """Give players RESUME_GRACE seconds to reconnect to a resumed game"""
+    await asyncio.sleep(RESUME_GRACE)
+    if game.game_active and len(manager.get_connected_users()) < 2:
+        await manager.broadcast({
+            "type": "game_over",
+            "message": "Game ended - not enough players came back",
+            "scores": game.get_sorted_scores()
+        })
+        game.reset_game()
+
+
+@profiler.timed("game")
 async def start_new_round(session: Session):
     """Start a new trivia round"""
     q = game.choose_random_question(session)
@@ -447,6 +551,7 @@ async def start_new_round(session: Session):
     await manager.broadcast({
         "type": "new_question",
         "question": q.front,
+        "media": game.question_media,
         "options": game.question_options,
         "round": game.round_number + 1,
         "total_rounds": game.max_rounds
@@ -476,6 +581,7 @@ async def end_game():
     game.ready_players.clear()
     game.answered_this_round.clear()
     game.current_question = None
+    game.question_media = []
     game.round_number = 0
     
     await asyncio.sleep(3)
@@ -0,0 +1,244 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response
+from sqlalchemy import delete, update
+from sqlmodel import select
+from ..db.session import SessionDep
+from ..db.models import Card, Set, CardBulk, SetBulk
+from ..core.responses import FastJSONResponse
+from ..core.bundles import bump_deck_versions, bundle_etag, deck_version, ensure_bundle, forget_deck
+from ..core.media import delete_card_media, delete_set_cards, remove_unused_blob
+
+# Handlers return FastJSONResponse directly so FastAPI skips jsonable_encoder on the rows
+router = APIRouter(prefix="/api/v1", default_response_class=FastJSONResponse)
+
+CARD_FIELDS = {"id": Card.id, "front": Card.front, "back": Card.back, "set_ID": Card.set_ID}
+SET_FIELDS = {"id": Set.id, "name": Set.name}
+MAX_LIMIT = 500
+
+
+def parse_fields(fields: str | None, allowed: dict):
+    """Turn ?fields=id,front into column names, always keeping id first for cursors"""
+    if not fields:
+        return list(allowed)
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in names if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return ["id"] + [f for f in dict.fromkeys(names) if f != "id"]
+
+
+def parse_ids(ids: str):
+    try:
+        id_list = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma separated list of integers")
+    if len(id_list) > MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_LIMIT} ids per request")
+    return id_list
+
+
+def select_rows(session, model_fields: dict, names: list, *where, after=None, limit=None):
+    """Select only the requested columns and build dicts straight from the row tuples"""
+    id_col = model_fields["id"]
+    query = select(*(model_fields[n] for n in names)).where(*where).order_by(id_col)
+    if after is not None:
+        query = query.where(id_col > after)
+    if limit is not None:
+        query = query.limit(limit)
+    return [dict(zip(names, row)) for row in session.exec(query).all()]
+
+
+def page(rows, limit):
+    """Keyset page: fetched limit + 1 rows, the extra one only tells us there's more"""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {"data": rows, "next_after": rows[-1]["id"] if has_more else None}
+
+
+# ---------------- Cards ---------------- #
+@router.get("/cards")
+async def list_cards(
+    session: SessionDep,
+    fields: str | None = None,
+    set_id: int | None = None,
+    after: int | None = None,
+    limit: int = Query(100, ge=1, le=MAX_LIMIT),
+):
+    names = parse_fields(fields, CARD_FIELDS)
+    where = [Card.set_ID == set_id] if set_id is not None else []
+    rows = select_rows(session, CARD_FIELDS, names, *where, after=after, limit=limit + 1)
+    return FastJSONResponse(page(rows, limit))
+
+
+@router.get("/cards/batch")
+async def get_cards_batch(session: SessionDep, ids: str, fields: str | None = None):
+    names = parse_fields(fields, CARD_FIELDS)
+    id_list = parse_ids(ids)
+    rows = select_rows(session, CARD_FIELDS, names, Card.id.in_(id_list))
+    found = {row["id"] for row in rows}
+    return FastJSONResponse({"data": rows, "missing": [i for i in id_list if i not in found]})
+
+
+@router.get("/cards/{card_id}")
+async def get_card(card_id: int, session: SessionDep, fields: str | None = None):
+    names = parse_fields(fields, CARD_FIELDS)
+    rows = select_rows(session, CARD_FIELDS, names, Card.id == card_id)
+    if not rows:
+        raise HTTPException(status_code=404, detail="Card not found")
+    return FastJSONResponse(rows[0])
+
+
+@router.post("/cards/bulk")
+async def bulk_cards(payload: CardBulk, session: SessionDep):
+    """Create, update and delete cards in one transaction, all or nothing"""
+    set_ids = {c.set_ID for c in payload.create} | {c.set_ID for c in payload.update if c.set_ID is not None}
+    if set_ids:
+        existing = set(session.exec(select(Set.id).where(Set.id.in_(set_ids))).all())
+        if set_ids - existing:
+            raise HTTPException(status_code=404, detail=f"Set not found: {sorted(set_ids - existing)}")
+
+    # Every set that gains, loses or changes a card needs its deck bundle rebuilt
+    touched = {c.id for c in payload.update} | set(payload.delete)
+    if touched:
+        set_ids |= set(session.exec(select(Card.set_ID).where(Card.id.in_(touched))).all())
+
+    new_cards = [Card(**c.model_dump()) for c in payload.create]
+    try:
+        session.add_all(new_cards)
+        session.flush()
+        created = [obj.id for obj in new_cards]
+        updated = 0
+        for c in payload.update:
+            values = c.model_dump(exclude={"id"}, exclude_none=True)
+            if not values:
+                continue
+            result = session.execute(update(Card).where(Card.id == c.id).values(**values))
+            if result.rowcount == 0:
+                raise HTTPException(status_code=404, detail=f"Card not found: {c.id}")
+            updated += 1
+        deleted = 0
+        hashes = set()
+        if payload.delete:
+            hashes = delete_card_media(session, payload.delete)
+            deleted = session.execute(delete(Card).where(Card.id.in_(payload.delete))).rowcount
+        bump_deck_versions(session, set_ids)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    for sha256 in hashes:
+        remove_unused_blob(session, sha256)
+
+    return FastJSONResponse({
+        "created": created,
+        "updated": updated,
+        "deleted": deleted,
+    })
+
+
+# ---------------- Sets ---------------- #
+@router.get("/sets")
+async def list_sets(
+    session: SessionDep,
+    fields: str | None = None,
+    after: int | None = None,
+    limit: int = Query(100, ge=1, le=MAX_LIMIT),
+):
+    names = parse_fields(fields, SET_FIELDS)
+    rows = select_rows(session, SET_FIELDS, names, after=after, limit=limit + 1)
+    return FastJSONResponse(page(rows, limit))
+
+
+@router.get("/sets/batch")
+async def get_sets_batch(session: SessionDep, ids: str, fields: str | None = None):
+    names = parse_fields(fields, SET_FIELDS)
+    id_list = parse_ids(ids)
+    rows = select_rows(session, SET_FIELDS, names, Set.id.in_(id_list))
+    found = {row["id"] for row in rows}
+    return FastJSONResponse({"data": rows, "missing": [i for i in id_list if i not in found]})
+
+
+@router.get("/sets/{set_id}")
+async def get_set(set_id: int, session: SessionDep, fields: str | None = None):
+    names = parse_fields(fields, SET_FIELDS)
+    rows = select_rows(session, SET_FIELDS, names, Set.id == set_id)
+    if not rows:
+        raise HTTPException(status_code=404, detail="Set not found")
+    return FastJSONResponse(rows[0])
+
+
+@router.post("/sets/bulk")
+async def bulk_sets(payload: SetBulk, session: SessionDep):
+    """Create, update and delete sets in one transaction, all or nothing"""
+    new_sets = [Set(**s.model_dump()) for s in payload.create]
+    try:
+        session.add_all(new_sets)
+        session.flush()
+        created = [obj.id for obj in new_sets]
+        updated = []
+        for s in payload.update:
+            values = s.model_dump(exclude={"id"}, exclude_none=True)
+            if not values:
+                continue
+            result = session.execute(update(Set).where(Set.id == s.id).values(**values))
+            if result.rowcount == 0:
+                raise HTTPException(status_code=404, detail=f"Set not found: {s.id}")
+            updated.append(s.id)
+        # The set name is part of the deck bundle too
+        bump_deck_versions(session, updated)
+        deleted = 0
+        hashes = set()
+        if payload.delete:
+            # A deleted set takes its cards (and their attachments) with it
+            hashes = delete_set_cards(session, payload.delete)
+            for set_id in payload.delete:
+                forget_deck(session, set_id)
+            deleted = session.execute(delete(Set).where(Set.id.in_(payload.delete))).rowcount
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    for sha256 in hashes:
+        remove_unused_blob(session, sha256)
+
+    return FastJSONResponse({
+        "created": created,
+        "updated": len(updated),
+        "deleted": deleted,
+    })
+
+
+# ---------------- Decks ---------------- #
+@router.get("/decks/{set_id}")
+async def get_deck(set_id: int, session: SessionDep, fields: str | None = None):
+    """A deck is a set together with all of its cards, in one response"""
+    rows = select_rows(session, SET_FIELDS, list(SET_FIELDS), Set.id == set_id)
+    if not rows:
+        raise HTTPException(status_code=404, detail="Set not found")
+    deck = rows[0]
+    deck["cards"] = select_rows(session, CARD_FIELDS, parse_fields(fields, CARD_FIELDS), Card.set_ID == set_id)
+    return FastJSONResponse(deck)
+
+
+@router.get("/decks/{set_id}/bundle")
+async def get_deck_bundle(set_id: int, request: Request, session: SessionDep):
+    """Whole deck as one gzip'd JSON snapshot, built once per set version and served from disk.
+
+    Clients revalidate with If-None-Match and can resume downloads with Range.
+    """
+    found = deck_version(session, set_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Set not found")
+    name, token, version = found
+
+    etag = bundle_etag(set_id, token, version)
+    headers = {"etag": etag, "cache-control": "no-cache", "x-deck-version": str(version)}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    path = ensure_bundle(session, set_id, name, token, version)
+    # FileResponse handles Range/If-Range and uses zero-copy pathsend when the server offers it
+    return FileResponse(path, media_type="application/gzip", headers=headers)
@@ -6,6 +6,8 @@ from ..db.session import get_session
 from ..db.models import Card
 from ..core.templates import templates
 from ..db.models import Set
+from ..core.bundles import bump_deck_versions
+from ..core.media import delete_card_media, media_info, remove_unused_blob
 
 router = APIRouter(prefix="/cards")
 
@@ -34,6 +36,7 @@ async def add_card(request: Request, session: Session = Depends(get_session),
         set_ID=set_ID,
     )
     session.add(new_card)
+    bump_deck_versions(session, [set_ID])
     session.commit()
     session.refresh(new_card)
     return RedirectResponse(url="/cards", status_code=302)
@@ -45,7 +48,9 @@ async def get_card(request: Request, card_id: int, session: Session = Depends(ge
     if not card:
         raise HTTPException(status_code=404, detail="Card not found")
     return templates.TemplateResponse(
-        request=request, name="cards/card_details.html", context={"request": request, "card": card}
+        request=request,
+        name="cards/card_details.html",
+        context={"request": request, "card": card, "media": [media_info(m) for m in card.media]}
     )
 
 
@@ -72,6 +77,7 @@ async def update_card(
     card = session.exec(select(Card).where(Card.id == card_id)).first()
     if not card:
         raise HTTPException(404, "Card not found")
+    bump_deck_versions(session, [card.set_ID, set_ID])
     card.front, card.back, card.set_ID = front, back, set_ID
     session.add(card)
     session.commit()
@@ -83,6 +89,10 @@ async def delete_card(card_id: int, session: Session = Depends(get_session)):
     card = session.exec(select(Card).where(Card.id == card_id)).first()
     if not card:
         raise HTTPException(404, "Card not found")
+    bump_deck_versions(session, [card.set_ID])
+    hashes = delete_card_media(session, [card.id])
     session.delete(card)
     session.commit()
+    for sha256 in hashes:
+        remove_unused_blob(session, sha256)
     return RedirectResponse(url="/cards", status_code=302)
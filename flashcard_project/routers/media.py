@@ -0,0 +1,120 @@
+import os
+from fastapi import APIRouter, BackgroundTasks, File, HTTPException, Path, Request, UploadFile
+from fastapi.responses import FileResponse, RedirectResponse
+from fastapi.routing import APIRoute
+from sqlmodel import select
+from ..db.session import SessionDep
+from ..db.models import Card, MediaFile
+from ..core.assets import IMMUTABLE_CACHE
+from ..core.media import (
+    MAX_MEDIA_SIZE, MAX_UPLOAD_OVERHEAD, MediaTooLarge, UnsupportedMedia, blob_path, ensure_thumbnail,
+    has_thumbnail, is_allowed, remove_unused_blob, store_upload,
+)
+
+TOO_LARGE = f"Files must be under {MAX_MEDIA_SIZE // (1024 * 1024)} MB"
+
+
+class UploadLimitRoute(APIRoute):
+    """Turns uploads away on their Content-Length, before the body is read.
+
+    FastAPI spools the whole multipart body to disk before the handler or any
+    dependency runs. Chunked uploads send no Content-Length, those are still
+    spooled and only store_upload's size check catches them.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def limited_handler(request: Request):
+            length = request.headers.get("content-length", "")
+            if length.isdigit() and int(length) > MAX_MEDIA_SIZE + MAX_UPLOAD_OVERHEAD:
+                raise HTTPException(status_code=413, detail=TOO_LARGE)
+            return await handler(request)
+
+        return limited_handler
+
+
+router = APIRouter(route_class=UploadLimitRoute)
+
+# Blobs are named by their hash, so a URL never changes content
+Sha256 = Path(pattern="^[0-9a-f]{64}$")
+# Browsers must not second-guess the type or run anything they're served from /media
+SAFE_HEADERS = {"x-content-type-options": "nosniff", "content-security-policy": "default-src 'none'; sandbox"}
+
+
+@router.post("/cards/{card_id}/media")
+async def upload_media(card_id: int, session: SessionDep, background_tasks: BackgroundTasks,
+                       file: UploadFile = File(...)):
+    card = session.get(Card, card_id)
+    if not card:
+        raise HTTPException(status_code=404, detail="Card not found")
+    try:
+        sha256, size, content_type = await store_upload(file)
+    except UnsupportedMedia:
+        raise HTTPException(status_code=415, detail="Only PNG, JPEG, GIF, WebP images and common audio files can be attached")
+    except MediaTooLarge:
+        raise HTTPException(status_code=413, detail=TOO_LARGE)
+
+    media = MediaFile(
+        card_id=card_id,
+        sha256=sha256,
+        content_type=content_type,
+        size=size,
+        filename=os.path.basename(file.filename or "upload"),
+    )
+    session.add(media)
+    session.commit()
+
+    if has_thumbnail(content_type):
+        background_tasks.add_task(ensure_thumbnail, sha256)
+    return RedirectResponse(url=f"/cards/{card_id}", status_code=302)
+
+
+@router.post("/cards/{card_id}/media/{media_id}/delete")
+async def delete_media(card_id: int, media_id: int, session: SessionDep):
+    media = session.exec(
+        select(MediaFile).where(MediaFile.id == media_id, MediaFile.card_id == card_id)
+    ).first()
+    if not media:
+        raise HTTPException(status_code=404, detail="Media not found")
+    sha256 = media.sha256
+    session.delete(media)
+    session.commit()
+    remove_unused_blob(session, sha256)
+    return RedirectResponse(url=f"/cards/{card_id}", status_code=302)
+
+
+def lookup_type(session, sha256: str) -> str:
+    content_type = session.exec(
+        select(MediaFile.content_type).where(MediaFile.sha256 == sha256)
+    ).first()
+    if content_type is None or not os.path.exists(blob_path(sha256)):
+        raise HTTPException(status_code=404, detail="Media not found")
+    return content_type
+
+
+@router.get("/media/{sha256}")
+async def get_media(session: SessionDep, sha256: str = Sha256):
+    """Serve an attachment; FileResponse handles Range so audio can seek"""
+    content_type = lookup_type(session, sha256)
+    headers = {"cache-control": IMMUTABLE_CACHE, "etag": f'"{sha256}"', **SAFE_HEADERS}
+    if not is_allowed(content_type):
+        # Anything stored before the allow-list is only offered as a download
+        content_type = "application/octet-stream"
+        headers["content-disposition"] = "attachment"
+    return FileResponse(blob_path(sha256), media_type=content_type, headers=headers)
+
+
+@router.get("/media/{sha256}/thumb")
+async def get_thumbnail(session: SessionDep, sha256: str = Sha256):
+    content_type = lookup_type(session, sha256)
+    if not has_thumbnail(content_type):
+        raise HTTPException(status_code=404, detail="No thumbnail for this media")
+    path = await ensure_thumbnail(sha256)
+    if path is None:
+        raise HTTPException(status_code=404, detail="No thumbnail for this media")
+    return FileResponse(
+        path,
+        media_type="image/webp",
+        headers={"cache-control": IMMUTABLE_CACHE, "etag": f'"{sha256}-thumb"', **SAFE_HEADERS},
+    )
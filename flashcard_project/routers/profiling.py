@@ -0,0 +1,23 @@
+from fastapi import APIRouter, HTTPException, Request
+from ..core.profiling import is_local, profiler
+from ..core.responses import FastJSONResponse
+
+router = APIRouter(prefix="/debug")
+
+
+@router.get("/profile")
+async def get_profile(request: Request, limit: int = 20):
+    """Slowest recent routes, WebSocket handlers and queries. Only from this machine"""
+    if not profiler.enabled:
+        raise HTTPException(status_code=404, detail="Profiling is off, set FLASHCARD_PROFILE=1")
+    if not is_local(request.client):
+        raise HTTPException(status_code=403, detail="Profile data is only available locally")
+    return FastJSONResponse({
+        "sample_rate": profiler.sample_rate,
+        "slow_query_ms": profiler.slow_query_ms,
+        "routes": profiler.slowest("route", limit),
+        # Handlers sleep between rounds, so wall time would only show the sleeps
+        "websocket": profiler.slowest("websocket", limit, key="cpu_ms"),
+        "game": profiler.slowest("game", limit, key="cpu_ms"),
+        "queries": profiler.slowest_queries(limit),
+    })
@@ -6,6 +6,8 @@ from ..db.session import SessionDep, get_session
 from ..db.models import Set
 from fastapi import Depends, Form, HTTPException
 from ..core.templates import templates  
+from ..core.bundles import forget_deck
+from ..core.media import delete_set_cards, remove_unused_blob
 router = APIRouter(prefix="/sets")
 
 @router.get("/", response_class=HTMLResponse)
@@ -47,6 +49,10 @@ async def delete_set(set_id: int, session: Session = Depends(get_session)):
     set = session.exec(select(Set).where(Set.id == set_id)).first()
     if not set:
         raise HTTPException(status_code=404, detail="Set not found")
+    hashes = delete_set_cards(session, [set_id])
+    forget_deck(session, set_id)
     session.delete(set)
     session.commit()
+    for sha256 in hashes:
+        remove_unused_blob(session, sha256)
     return RedirectResponse(url="/sets", status_code=302)
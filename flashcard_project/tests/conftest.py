@@ -0,0 +1,43 @@
+import os
+import sys
+
+#flashcard.py uses package-relative imports, so the tests import it as flashcard_project.flashcard
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PROJECT_DIR))
+
+import pytest
+from fastapi.testclient import TestClient
+from flashcard_project.flashcard import app, get_session
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.pool import StaticPool
+
+
+@pytest.fixture
+def engine():
+    #In-memory database so the tests never touch database.db
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def session(engine):
+    with Session(engine) as session:
+        app.dependency_overrides[get_session] = lambda: session
+        yield session
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    #Media, bundles and profiles are written relative to the working directory, templates are read from it
+    (tmp_path / "templates").symlink_to(os.path.join(PROJECT_DIR, "templates"))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def client(session):
+    return TestClient(app)
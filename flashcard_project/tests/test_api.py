@@ -0,0 +1,133 @@
+from flashcard_project.core.bundles import deck_version, ensure_bundle
+import gzip
+import orjson
+
+
+def make_deck(client):
+    set_id = client.post("/api/v1/sets/bulk", json={"create": [{"name": "Science"}]}).json()["created"][0]
+    cards = [{"front": f"Q{i}", "back": f"A{i}", "set_ID": set_id} for i in range(5)]
+    card_ids = client.post("/api/v1/cards/bulk", json={"create": cards}).json()["created"]
+    return set_id, card_ids
+
+
+def test_field_selection_and_keyset_pagination(client):
+    set_id, card_ids = make_deck(client)
+
+    response = client.get("/api/v1/cards", params={"fields": "front", "limit": 2})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["data"] == [{"id": card_ids[0], "front": "Q0"}, {"id": card_ids[1], "front": "Q1"}]
+
+    #Follow the cursor to the last page
+    seen = [row["id"] for row in body["data"]]
+    while body["next_after"] is not None:
+        body = client.get("/api/v1/cards", params={"limit": 2, "after": body["next_after"]}).json()
+        seen += [row["id"] for row in body["data"]]
+    assert seen == card_ids
+
+    assert client.get("/api/v1/cards", params={"fields": "password"}).status_code == 400
+
+
+def test_batch_get_and_deck(client):
+    set_id, card_ids = make_deck(client)
+
+    body = client.get("/api/v1/cards/batch", params={"ids": f"{card_ids[0]},{card_ids[2]},999"}).json()
+    assert [row["id"] for row in body["data"]] == [card_ids[0], card_ids[2]]
+    assert body["missing"] == [999]
+
+    deck = client.get(f"/api/v1/decks/{set_id}", params={"fields": "front,back"}).json()
+    assert deck["name"] == "Science"
+    assert len(deck["cards"]) == 5
+    assert set(deck["cards"][0]) == {"id", "front", "back"}
+
+
+def test_bulk_is_one_transaction(client):
+    set_id, card_ids = make_deck(client)
+
+    response = client.post("/api/v1/cards/bulk", json={
+        "update": [{"id": card_ids[0], "front": "Changed"}],
+        "delete": [card_ids[1]],
+    })
+    assert response.json() == {"created": [], "updated": 1, "deleted": 1}
+    assert client.get(f"/api/v1/cards/{card_ids[0]}").json()["front"] == "Changed"
+    assert client.get(f"/api/v1/cards/{card_ids[1]}").status_code == 404
+
+    #A bad update rolls back the create and delete in the same request
+    response = client.post("/api/v1/cards/bulk", json={
+        "create": [{"front": "New", "back": "Card", "set_ID": set_id}],
+        "update": [{"id": 999, "front": "Nope"}],
+        "delete": [card_ids[2]],
+    })
+    assert response.status_code == 404
+    assert len(client.get("/api/v1/cards").json()["data"]) == 4
+
+
+def test_deck_bundle_is_cached_until_a_card_changes(client, workdir):
+    set_id, card_ids = make_deck(client)
+
+    response = client.get(f"/api/v1/decks/{set_id}/bundle")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    bundle = orjson.loads(gzip.decompress(response.content))
+    assert bundle["set"]["name"] == "Science"
+    assert [row[1] for row in bundle["cards"]] == ["Q0", "Q1", "Q2", "Q3", "Q4"]
+    etag = response.headers["etag"]
+
+    #Same version: 304, and ranges are served from the same file
+    assert client.get(f"/api/v1/decks/{set_id}/bundle", headers={"if-none-match": etag}).status_code == 304
+    partial = client.get(f"/api/v1/decks/{set_id}/bundle", headers={"range": "bytes=0-9"})
+    assert partial.status_code == 206
+    assert partial.content == response.content[:10]
+
+    #Editing a card in the set produces a new version and replaces the old file
+    client.post("/api/v1/cards/bulk", json={"update": [{"id": card_ids[0], "front": "Changed"}]})
+    response = client.get(f"/api/v1/decks/{set_id}/bundle", headers={"if-none-match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert orjson.loads(gzip.decompress(response.content))["cards"][0][1] == "Changed"
+    assert len(list((workdir / "bundles").iterdir())) == 1
+
+
+def test_bulk_limits_and_set_delete_takes_cards(client):
+    set_id, card_ids = make_deck(client)
+
+    too_many = ",".join(str(i) for i in range(1, 502))
+    assert client.get("/api/v1/cards/batch", params={"ids": too_many}).status_code == 400
+
+    response = client.post("/api/v1/cards/bulk", json={"update": [{"id": card_ids[0]}, {"id": card_ids[1], "back": "B"}]})
+    assert response.json()["updated"] == 1
+
+    response = client.post("/api/v1/sets/bulk", json={"delete": [set_id]})
+    assert response.json()["deleted"] == 1
+    assert client.get("/api/v1/cards").json()["data"] == []
+
+    #A new set that reuses the id doesn't inherit the old cards
+    new_id = client.post("/api/v1/sets/bulk", json={"create": [{"name": "History"}]}).json()["created"][0]
+    assert client.get(f"/api/v1/decks/{new_id}").json()["cards"] == []
+
+
+def test_bundle_etag_differs_when_set_id_is_reused(client, workdir):
+    set_id, card_ids = make_deck(client)
+    etag = client.get(f"/api/v1/decks/{set_id}/bundle").headers["etag"]
+
+    client.post("/api/v1/sets/bulk", json={"delete": [set_id]})
+    new_id, new_cards = make_deck(client)
+    assert new_id == set_id
+
+    response = client.get(f"/api/v1/decks/{new_id}/bundle", headers={"if-none-match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_stale_bundle_build_keeps_the_newer_file(client, session, workdir):
+    set_id, card_ids = make_deck(client)
+    name, token, version = deck_version(session, set_id)
+
+    #A request bumps the version and builds the new bundle...
+    client.post("/api/v1/cards/bulk", json={"update": [{"id": card_ids[0], "front": "Changed"}]})
+    client.get(f"/api/v1/decks/{set_id}/bundle")
+    newer = list((workdir / "bundles").iterdir())
+
+    #...while one that read the old version finishes its build afterwards
+    ensure_bundle(session, set_id, name, token, version)
+    assert all(path.exists() for path in newer)
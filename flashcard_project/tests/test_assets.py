@@ -0,0 +1,70 @@
+import gzip
+import os
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+from flashcard_project.core.assets import AssetStaticFiles, asset_path, build_assets, load_manifest
+
+
+def make_static(tmp_path):
+    (tmp_path / "css").mkdir()
+    (tmp_path / "css" / "styles.css").write_text("body { color: red; }\n" * 50)
+    (tmp_path / "notes.txt").write_text("not an asset")
+    return tmp_path
+
+
+def test_build_assets_fingerprints_and_precompresses(tmp_path):
+    static = make_static(tmp_path)
+    manifest = build_assets(str(static))
+
+    built = manifest["css/styles.css"]
+    assert built.startswith("dist/css/styles.") and built.endswith(".css")
+    assert "notes.txt" not in manifest
+    assert asset_path("css/styles.css") == built
+    assert gzip.decompress((static / (built + ".gz")).read_bytes()) == (static / "css" / "styles.css").read_bytes()
+
+    #Changing the source gives a new name and removes the old build
+    (static / "css" / "styles.css").write_text("body { color: blue; }\n")
+    rebuilt = build_assets(str(static))["css/styles.css"]
+    assert rebuilt != built
+    assert not os.path.exists(static / built)
+
+
+def test_load_manifest_only_when_fresh(tmp_path):
+    static = make_static(tmp_path)
+    assert load_manifest(str(static)) is None
+
+    built = build_assets(str(static))["css/styles.css"]
+    assert load_manifest(str(static))["css/styles.css"] == built
+
+    #A source edited after the build makes the manifest stale
+    manifest_path = static / "dist" / "manifest.json"
+    os.utime(manifest_path, (0, 0))
+    assert load_manifest(str(static)) is None
+
+    build_assets(str(static))
+    (static / "css" / "extra.css").write_text("p {}")
+    assert load_manifest(str(static)) is None
+
+
+def test_static_files_negotiate_encoding(tmp_path):
+    static = make_static(tmp_path)
+    built = build_assets(str(static))["css/styles.css"]
+    app = Starlette(routes=[Mount("/static", AssetStaticFiles(directory=str(static)), name="static")])
+    client = TestClient(app)
+
+    response = client.get("/static/" + built, headers={"accept-encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-type"].startswith("text/css")
+    assert "immutable" in response.headers["cache-control"]
+    assert response.text.startswith("body { color: red; }")
+
+    response = client.get("/static/" + built, headers={"accept-encoding": "identity"})
+    assert "content-encoding" not in response.headers
+
+    #Unbuilt files are served as before, without the long cache header
+    response = client.get("/static/css/styles.css")
+    assert response.status_code == 200
+    assert "cache-control" not in response.headers
+
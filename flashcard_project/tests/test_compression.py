@@ -0,0 +1,100 @@
+import asyncio
+import gzip
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from flashcard_project.core.compression import CompressionMiddleware, GzipStream, accepted_encodings
+
+PAGE = "<li>Card</li>" * 200
+
+
+async def big_page(request):
+    return HTMLResponse(PAGE)
+
+
+async def small_json(request):
+    return JSONResponse({"ok": True})
+
+
+async def streamed(request):
+    async def chunks():
+        for _ in range(5):
+            yield PAGE
+    return StreamingResponse(chunks(), media_type="text/html")
+
+
+async def image(request):
+    return Response(b"\x89PNG" * 500, media_type="image/png")
+
+
+app = Starlette(
+    routes=[Route("/page", big_page), Route("/small", small_json),
+            Route("/stream", streamed), Route("/image", image)],
+    middleware=[Middleware(CompressionMiddleware, minimum_size=500)],
+)
+client = TestClient(app)
+
+
+def test_compresses_large_html():
+    response = client.get("/page", headers={"accept-encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(PAGE)
+    assert response.text == PAGE
+
+
+def test_prefers_brotli():
+    response = client.get("/page", headers={"accept-encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.text == PAGE
+
+
+def test_streams_chunk_by_chunk():
+    response = client.get("/stream", headers={"accept-encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text == PAGE * 5
+
+
+def test_skips_small_and_binary_and_unaccepted():
+    assert "content-encoding" not in client.get("/small", headers={"accept-encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/image", headers={"accept-encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/page", headers={"accept-encoding": "identity"}).headers
+
+
+def test_gzip_stream_output_is_valid_per_chunk():
+    stream = GzipStream()
+    data = stream.compress(b"hello ") + stream.compress(b"world") + stream.finish()
+    assert gzip.decompress(data) == b"hello world"
+
+
+def test_accepted_encodings():
+    assert accepted_encodings("gzip, deflate, br;q=0.5") == {"gzip", "deflate", "br"}
+    assert accepted_encodings("br;q=0, gzip") == {"gzip"}
+    assert accepted_encodings("") == set()
+
+
+def test_pathsend_gets_its_start_message(tmp_path):
+    path = tmp_path / "page.html"
+    path.write_text(PAGE)
+    sent = []
+
+    async def file_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/html")]})
+        await send({"type": "http.response.pathsend", "path": str(path)})
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", b"gzip")],
+             "extensions": {"http.response.pathsend": {}}}
+    asyncio.run(CompressionMiddleware(file_app)(scope, receive, send))
+
+    assert [m["type"] for m in sent] == ["http.response.start", "http.response.pathsend"]
+    assert b"content-encoding" not in dict(sent[0]["headers"])
@@ -1,6 +1,6 @@
 from fastapi.testclient import TestClient
 from bs4 import BeautifulSoup
-from flashcard import app, get_session
+from flashcard_project.flashcard import app, get_session
 from sqlmodel import Session, Field, SQLModel, create_engine, select, Relationship
 import re
 
@@ -0,0 +1,81 @@
+from flashcard_project.flashcard import game, Card, Set
+from PIL import Image
+import io
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def cards(workdir, session):
+    session.add(Set(id=1, name="Science"))
+    session.add(Card(id=1, front="Mitochondria?", back="Powerhouse", set_ID=1))
+    session.add(Card(id=2, front="Nucleus?", back="Control center", set_ID=1))
+    session.commit()
+
+
+def png_bytes():
+    buf = io.BytesIO()
+    Image.new("RGB", (800, 600), "red").save(buf, "PNG")
+    return buf.getvalue()
+
+
+def test_upload_is_deduplicated_and_served_with_ranges(client, workdir):
+    data = png_bytes()
+    for card_id in (1, 2):
+        response = client.post(f"/cards/{card_id}/media", files={"file": ("cell.png", data, "image/png")})
+        assert response.status_code == 200
+
+    #Both cards point at a single file on disk
+    blobs = [p for p in (workdir / "media").rglob("*") if p.is_file() and "thumbs" not in p.parts]
+    assert len(blobs) == 1
+
+    html = client.get("/cards/1").text
+    assert f"/media/{blobs[0].name}" in html
+
+    response = client.get(f"/media/{blobs[0].name}")
+    assert response.content == data
+    assert "immutable" in response.headers["cache-control"]
+    assert response.headers["x-content-type-options"] == "nosniff"
+    partial = client.get(f"/media/{blobs[0].name}", headers={"range": "bytes=0-99"})
+    assert partial.status_code == 206
+    assert partial.content == data[:100]
+
+    thumb = client.get(f"/media/{blobs[0].name}/thumb")
+    assert thumb.headers["content-type"] == "image/webp"
+    assert max(Image.open(io.BytesIO(thumb.content)).size) <= 320
+
+
+def test_rejects_other_file_types(client):
+    response = client.post("/cards/1/media", files={"file": ("notes.txt", b"hello", "text/plain")})
+    assert response.status_code == 415
+
+
+def test_rejects_svg_whatever_type_it_claims(client, workdir):
+    svg = b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(1)</script></svg>'
+    for content_type in ("image/svg+xml", "image/png"):
+        response = client.post("/cards/1/media", files={"file": ("cell.svg", svg, content_type)})
+        assert response.status_code == 415
+    #Nothing was kept, not even the temp file
+    assert not [p for p in (workdir / "media").rglob("*") if p.is_file()]
+    assert "/media/" not in client.get("/cards/1").text
+
+
+def test_rejects_mp4_video_and_oversized_uploads(client, monkeypatch):
+    video = b"\x00\x00\x00\x18ftypisom" + b"\x00" * 64
+    response = client.post("/cards/1/media", files={"file": ("clip.mp4", video, "audio/mp4")})
+    assert response.status_code == 415
+
+    #Content-Length alone is enough to turn the request away, store_upload still has the real limit
+    monkeypatch.setattr("flashcard_project.routers.media.MAX_MEDIA_SIZE", 1000)
+    monkeypatch.setattr("flashcard_project.routers.media.MAX_UPLOAD_OVERHEAD", 0)
+    response = client.post("/cards/1/media", files={"file": ("cell.png", png_bytes(), "image/png")})
+    assert response.status_code == 413
+
+
+def test_question_payload_references_media_by_url(client, session):
+    client.post("/cards/1/media", files={"file": ("cell.png", png_bytes(), "image/png")})
+    client.post("/cards/2/media", files={"file": ("cell.png", png_bytes(), "image/png")})
+
+    game.choose_random_question(session)
+    assert len(game.question_media) == 1
+    assert game.question_media[0]["url"].startswith("/media/")
+    game.reset_game()
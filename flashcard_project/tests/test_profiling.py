@@ -0,0 +1,86 @@
+from fastapi.testclient import TestClient
+from flashcard_project.flashcard import app, profiler
+from flashcard_project.core.profiling import StackSampler, prune_profiles, write_collapsed
+from starlette.datastructures import Headers
+import asyncio
+import os
+import threading
+import time
+import pytest
+
+
+@pytest.fixture
+def client(workdir, engine, session):
+    #Log every query as slow so the test doesn't depend on timing
+    profiler.enable(engine, slow_query_ms=0)
+    yield TestClient(app, client=("127.0.0.1", 50000))
+    profiler.disable(engine)
+    profiler.timings.clear()
+    profiler.queries.clear()
+
+
+def test_routes_and_queries_are_listed(client):
+    client.post("/sets/add", data={"name": "Science"})
+    client.get("/sets/1")
+
+    report = client.get("/debug/profile").json()
+    assert "GET /sets/{set_id}" in [r["name"] for r in report["routes"]]
+    assert any("FROM \"set\"" in q["sql"] or "FROM set" in q["sql"] for q in report["queries"])
+
+
+def test_profile_header_only_counts_locally_or_with_token(client):
+    headers = Headers({"x-profile": "1"})
+    assert profiler.should_profile(headers, ("127.0.0.1", 50000))
+    assert not profiler.should_profile(headers, ("203.0.113.7", 50000))
+
+    profiler.token = "s3cret"
+    assert profiler.should_profile(Headers({"x-profile": "s3cret"}), ("203.0.113.7", 50000))
+    assert not profiler.should_profile(Headers({"x-profile": "guess"}), ("203.0.113.7", 50000))
+    assert client.get("/sets/", headers={"x-profile": "é".encode()}).status_code == 200
+
+    remote = TestClient(app, client=("203.0.113.7", 50000))
+    assert remote.get("/debug/profile").status_code == 403
+
+
+def test_old_profiles_are_pruned(workdir):
+    os.makedirs("profiles")
+    for i in range(5):
+        path = workdir / "profiles" / f"{i}.collapsed"
+        path.write_text("main 1\n")
+        os.utime(path, (i, i))
+    prune_profiles(keep=2)
+    assert sorted(p.name for p in (workdir / "profiles").iterdir()) == ["3.collapsed", "4.collapsed"]
+
+
+def test_sampler_writes_collapsed_stacks(workdir):
+    sampler = StackSampler(threading.get_ident(), interval=0.001).start()
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+    path = write_collapsed(sampler.stop(), "GET /sets/{set_id}")
+
+    assert path.endswith(".collapsed") and "{" not in path
+    stack, count = (workdir / path).read_text().splitlines()[0].rsplit(" ", 1)
+    assert "test_sampler_writes_collapsed_stacks" in stack
+    assert int(count) > 0
+
+
+def test_track_records_handler_timing():
+    async def handler():
+        async with profiler.track("websocket", "answer"):
+            await asyncio.sleep(0.05)
+
+    profiler.enabled = True
+    try:
+        asyncio.run(handler())
+    finally:
+        profiler.enabled = False
+    row = profiler.slowest("websocket")[0]
+    assert row["name"] == "answer" and row["ms"] >= 50
+    #Sleeping doesn't count as CPU time, so it can't fill the slowest lists
+    assert row["cpu_ms"] < 25
+    profiler.timings.clear()
+
+
+def test_profile_endpoint_is_off_by_default():
+    assert TestClient(app).get("/debug/profile").status_code == 404
@@ -0,0 +1,93 @@
+import asyncio
+from fastapi.testclient import TestClient
+from flashcard_project.flashcard import Card, GameManager, Set, SnapshotWriter, app, game, load_snapshot, shutdown_requested
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.pool import StaticPool
+
+
+def make_engine():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def test_snapshot_only_writes_changed_fields():
+    engine = make_engine()
+    game = GameManager()
+    game.scores = {"alice": 0, "bob": 0}
+    game.game_active = True
+    writer = SnapshotWriter(engine, game.snapshot)
+
+    assert writer.write(game.snapshot(), heartbeat=True) == len(game.snapshot())
+    assert writer.write(game.snapshot(), heartbeat=True) == 0
+
+    game.scores["alice"] += 1
+    assert writer.write(game.snapshot(), heartbeat=True) == 1
+    assert load_snapshot(engine)["scores"] == {"alice": 1, "bob": 0}
+
+
+def test_restore_resumes_the_game():
+    engine = make_engine()
+    with Session(engine) as session:
+        session.add(Set(id=1, name="Science"))
+        session.add(Card(id=1, front="H2O?", back="Water", set_ID=1))
+        session.commit()
+
+        game = GameManager()
+        game.mark_ready("alice")
+        game.mark_ready("bob")
+        game.game_active = True
+        game.round_number = 3
+        game.current_question = session.get(Card, 1)
+        game.correct_answer = "Water"
+        game.question_options = ["Water", "Fire", "Air", "Earth"]
+        game.answered_this_round.add("alice")
+        game.scores["alice"] = 2
+        asyncio.run(SnapshotWriter(engine, game.snapshot).save())
+
+        restored = GameManager()
+        assert restored.restore(load_snapshot(engine), session)
+    assert restored.game_active
+    assert restored.round_number == 3
+    assert restored.current_question.front == "H2O?"
+    assert restored.scores == {"alice": 2, "bob": 0}
+    assert restored.answered_this_round == {"alice"}
+    assert restored.check_answer("bob", "Water") is True
+
+
+def test_stale_snapshot_is_ignored():
+    engine = make_engine()
+    game = GameManager()
+    game.game_active = True
+    SnapshotWriter(engine, game.snapshot).write(game.snapshot(), heartbeat=True)
+    assert load_snapshot(engine, max_age=60) is not None
+    assert load_snapshot(engine, max_age=-1) is None
+
+
+def ready_then_close(code):
+    client = TestClient(app)
+    with client.websocket_connect("/ws/bob"):
+        with client.websocket_connect("/ws/alice") as alice:
+            alice.send_json({"type": "ready"})
+            while alice.receive_json()["type"] != "ready_update":
+                pass
+            alice.close(code=code)
+
+
+def test_client_close_code_doesnt_keep_a_departed_player():
+    #Clients can send 1012 themselves, it mustn't leave them marked ready forever
+    ready_then_close(1012)
+    assert game.ready_players == set()
+    game.reset_game()
+
+
+def test_disconnect_during_shutdown_keeps_the_game():
+    shutdown_requested.set()
+    try:
+        ready_then_close(1012)
+        assert game.ready_players == {"alice"}
+    finally:
+        shutdown_requested.clear()
+        game.reset_game()